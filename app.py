@@ -1,55 +1,129 @@
 import streamlit as st
 import os
 from dotenv import load_dotenv
+from PIL import Image, ImageFilter
+import io
+import html
+import orjson
+import hashlib
+import itertools
+import time
+import base64
+import shutil
+import traceback
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+import numpy as np
+import cv2
+import xxhash
+
+def _img_key(b) -> int:
+    """Fast, deterministic 64-bit key for image bytes (or any contiguous buffer)."""
+    return xxhash.xxh3_64_intdigest(b)
 
 # Compatibility shim for streamlit-drawable-canvas
 # Fix for: AttributeError: module 'streamlit.elements.image' has no attribute 'image_to_url'
+# Only st_canvas calls this, because it needs a URL for its background image. Plain display
+# paths pass PIL images or raw bytes to st.image instead, since base64 data URLs are ~33%
+# larger and cannot be cached by the browser.
 try:
     import streamlit.elements.image
     if not hasattr(streamlit.elements.image, 'image_to_url'):
+        # Small LRU of encoded data URLs so identical canvases skip re-encoding on every rerun
+        _IMAGE_URL_CACHE = OrderedDict()
+        _IMAGE_URL_CACHE_SIZE = 32
+        _IMAGE_URL_CACHE_LOCK = threading.Lock()
+        
+        def _encode_image_url(raw, mode, size, width, output_format):
+            """Encode raw pixels to a data URL."""
+            # Remember whether the source carried transparency (e.g. canvas strokes)
+            has_alpha = mode == 'RGBA'
+            
+            if has_alpha:
+                # Composite onto a white background in one NumPy pass instead of split + masked paste
+                rgba = np.frombuffer(raw, dtype=np.uint8).reshape(size[1], size[0], 4)
+                alpha = rgba[..., 3:4].astype(np.float32) / 255.0
+                rgb = rgba[..., :3].astype(np.float32)
+                out = (rgb * alpha + 255.0 * (1.0 - alpha)).astype(np.uint8)
+                img = Image.frombuffer('RGB', size, out.tobytes(), 'raw', 'RGB', 0, 1)
+            else:
+                # Wrap the pixel buffer without copying it; every step below writes to a new image
+                img = Image.frombuffer(mode, size, raw, 'raw', mode, 0, 1)
+                if img.mode not in ['RGB']:
+                    img = img.convert('RGB')
+            
+            # Resize if width is specified
+            if width and width != img.width:
+                aspect_ratio = img.height / img.width
+                new_height = int(width * aspect_ratio)
+                # For large downscales, shrink by an integer factor with a cheap box filter first
+                # so LANCZOS only runs on an image about twice the target size
+                if width < img.width // 2:
+                    factor = img.width // (width * 2)
+                    if factor > 1:
+                        img = img.reduce(factor)
+                img = img.resize((width, new_height), Image.Resampling.LANCZOS)
+            
+            # Keep PNG only when transparency was involved; otherwise JPEG via OpenCV is much faster
+            if output_format.upper() == 'PNG' and has_alpha:
+                buffer = io.BytesIO()
+                # The data URL only travels to the browser, so favour encode speed over size
+                img.save(buffer, format='PNG', compress_level=1, optimize=False)
+                img_str = base64.b64encode(buffer.getvalue()).decode()
+                return f"data:image/png;base64,{img_str}"
+            
+            arr_bgr = cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)
+            ok, buf = cv2.imencode('.jpg', arr_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
+            if not ok:
+                return None
+            img_str = base64.b64encode(buf.tobytes()).decode()
+            return f"data:image/jpeg;base64,{img_str}"
+        
         def image_to_url(image, width=None, clamp=None, channels="RGB", output_format="PNG", image_id=None):
             """Fallback image_to_url function for streamlit-drawable-canvas compatibility."""
-            import base64
-            import io
-            from PIL import Image as PILImage
-            import numpy as np
-            
             try:
                 # Handle different image types
-                if isinstance(image, PILImage.Image):
-                    img = image.copy()
+                if isinstance(image, Image.Image):
+                    # Raw bytes only make sense for modes without a palette or exotic layout; P/LA/CMYK/I;16
+                    # etc. go through PIL first so colours (and any transparency) survive
+                    if image.mode not in ('RGB', 'RGBA', 'L'):
+                        keep_alpha = 'A' in image.mode or 'transparency' in image.info
+                        image = image.convert('RGBA' if keep_alpha else 'RGB')
+                    # tobytes() copies the raster once; everything after that works on this buffer
+                    raw, mode, size = image.tobytes(), image.mode, image.size
                 elif isinstance(image, np.ndarray):
                     # Ensure proper data type
                     if image.dtype != np.uint8:
                         image = (image * 255).astype(np.uint8) if image.max() <= 1 else image.astype(np.uint8)
-                    img = PILImage.fromarray(image)
+                    # Read the array buffer directly instead of building an intermediate PIL image
+                    arr = np.ascontiguousarray(image)
+                    channels_count = 1 if arr.ndim == 2 else arr.shape[2]
+                    mode = {1: 'L', 3: 'RGB', 4: 'RGBA'}.get(channels_count)
+                    if mode is None:
+                        return None
+                    raw, size = arr, (arr.shape[1], arr.shape[0])
                 else:
                     return None
                 
-                # Convert to RGB if needed
-                if img.mode == 'RGBA':
-                    # Create white background for RGBA images
-                    background = PILImage.new('RGB', img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[-1])  # Use alpha channel as mask
-                    img = background
-                elif img.mode not in ['RGB']:
-                    img = img.convert('RGB')
-                
-                # Resize if width is specified
-                if width and width != img.width:
-                    aspect_ratio = img.height / img.width
-                    new_height = int(width * aspect_ratio)
-                    img = img.resize((width, new_height), PILImage.Resampling.LANCZOS)
+                # Key the cache on a hash of the full pixel buffer plus everything that affects the output
+                key = (_img_key(raw), mode, size, width, output_format)
+                with _IMAGE_URL_CACHE_LOCK:
+                    url = _IMAGE_URL_CACHE.get(key)
+                    if url is not None:
+                        _IMAGE_URL_CACHE.move_to_end(key)
+                        return url
                 
-                # Convert to base64 data URL
-                buffer = io.BytesIO()
-                img.save(buffer, format='PNG')
-                img_str = base64.b64encode(buffer.getvalue()).decode()
-                return f"data:image/png;base64,{img_str}"
+                url = _encode_image_url(raw, mode, size, width, output_format)
+                if url is not None:
+                    with _IMAGE_URL_CACHE_LOCK:
+                        _IMAGE_URL_CACHE[key] = url
+                        if len(_IMAGE_URL_CACHE) > _IMAGE_URL_CACHE_SIZE:
+                            _IMAGE_URL_CACHE.popitem(last=False)
+                return url
                 
             except Exception as e:
                 print(f"Error in image_to_url: {e}")
-                import traceback
                 traceback.print_exc()
                 return None
         
@@ -66,19 +140,17 @@ from services import (
     generate_hd_image,
     erase_foreground,
     generate_video_from_image,
-    check_video_status,
+    check_video_statuses_bulk,
     get_video_result,
-    upload_image_for_video,
+    upload_image_bytes_for_video,
     get_available_models,
+    MODEL_NAMES,
+    MODEL_IDS,
+    MODEL_CAPS,
 )
-from PIL import Image
-import io
-import requests
-import json
-import time
-import base64
+# Process-wide keep-alive session shared with the services, so image polling and downloads reuse warm connections
+from services._http import SESSION as _SESSION
 from streamlit_drawable_canvas import st_canvas
-import numpy as np
 
 # Configure Streamlit page
 st.set_page_config(
@@ -88,21 +160,40 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def _load_env():
+    """Load .env once per process and return the settings the app reads."""
+    load_dotenv()
+    return {
+        'BRIA_API_KEY': os.getenv('BRIA_API_KEY'),
+        'Fal.ai_LTX_API_KEY': os.getenv('Fal.ai_LTX_API_KEY'),
+        'GOOGLE_API_KEY': os.getenv('GOOGLE_API_KEY'),
+        'ADSNAP_DEBUG': os.getenv('ADSNAP_DEBUG'),
+    }
+
 # Load environment variables
-print("Loading environment variables...")
-load_dotenv(verbose=True)  # Add verbose=True to see loading details
+env = _load_env()
 
-# Debug: Print environment variable status
-api_key = os.getenv("BRIA_API_KEY")
-print(f"API Key present: {bool(api_key)}")
-print(f"API Key value: {api_key if api_key else 'Not found'}")
-print(f"Current working directory: {os.getcwd()}")
-print(f".env file exists: {os.path.exists('.env')}")
+# Sepia coefficients, transposed so an (H, W, 3) array can be multiplied directly
+SEPIA_MATRIX = np.array([
+    [0.393, 0.769, 0.189],
+    [0.349, 0.686, 0.168],
+    [0.272, 0.534, 0.131]
+], dtype=np.float32).T
+
+# Per-band lookup table for the High Contrast filter (x * 1.5, clipped to 255)
+HIGH_CONTRAST_LUT = [min(int(v * 1.5), 255) for v in range(256)]
+
+# Selector options, built once instead of on every rerun
+IMAGE_ASPECT_RATIOS = ("1:1", "16:9", "9:16", "4:3", "3:4")
+VIDEO_ASPECT_RATIOS = ("16:9", "9:16", "1:1", "4:3", "3:4")
+VIDEO_FPS_OPTIONS = (24, 30)
+VIDEO_PROVIDERS = ("fal.ai", "Google Veo")
 
 def initialize_session_state():
     """Initialize session state variables."""
     if 'api_key' not in st.session_state:
-        st.session_state.api_key = os.getenv('BRIA_API_KEY')
+        st.session_state.api_key = env['BRIA_API_KEY']
     if 'generated_images' not in st.session_state:
         st.session_state.generated_images = []
     if 'current_image' not in st.session_state:
@@ -116,84 +207,445 @@ def initialize_session_state():
     if 'enhanced_prompt' not in st.session_state:
         st.session_state.enhanced_prompt = None
 
+def _stream_bytes(url: str, timeout: float, chunk_size: int) -> bytes:
+    """Stream a URL's body into memory on the shared session, raising on HTTP errors."""
+    with _SESSION.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True  # Undo any gzip/deflate transfer encoding
+        buffer = io.BytesIO()
+        shutil.copyfileobj(response.raw, buffer, length=chunk_size)
+        return buffer.getvalue()
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def _fetch_image_bytes(url: str) -> bytes:
+    """Fetch image bytes for a URL. Cached so reruns don't re-download; failures raise and are not cached."""
+    return _stream_bytes(url, timeout=30, chunk_size=64 * 1024)
+
+@st.cache_resource(ttl=3600, max_entries=4, show_spinner=False)
+def _fetch_video_bytes(url: str) -> bytes:
+    """Fetch a generated video for the download button. Only a few entries, since MP4s are multi-MB.
+    
+    cache_resource hands back the same immutable bytes object on every rerun, where cache_data
+    would unpickle a fresh multi-MB copy each time the button renders.
+    """
+    return _stream_bytes(url, timeout=60, chunk_size=1024 * 1024)
+
+def video_download_button(video_url):
+    """Download button for a generated video, served from the cached bytes."""
+    st.download_button(
+        "⬇️ Download Video",
+        _fetch_video_bytes(video_url),
+        f"generated_video_{int(time.time())}.mp4",
+        "video/mp4"
+    )
+
+def _session_lru(name, key, factory, maxlen=8):
+    """Return st.session_state[name][key], computing it with factory() on a miss.
+    
+    Entries are dropped oldest-first once there are more than maxlen, so per-session caches stay small.
+    """
+    cache = st.session_state.setdefault(name, {})
+    value = cache.get(key)
+    if value is None:
+        value = cache[key] = factory()
+        while len(cache) > maxlen:
+            cache.pop(next(iter(cache)))
+    return value
+
+def upload_bytes(uploaded_file) -> bytes:
+    """Return an upload's bytes, copied out of the UploadedFile once per file rather than on every rerun."""
+    return _session_lru("_upload_bytes", uploaded_file.file_id, uploaded_file.getvalue)
+
+def fal_upload_url(uploaded_file, api_key):
+    """Upload an image to fal and return its URL, reusing the earlier URL when the same bytes were already sent."""
+    data = upload_bytes(uploaded_file)
+    return _session_lru(
+        "_fal_uploads",
+        _bytes_digest(data),
+        lambda: upload_image_bytes_for_video(data, uploaded_file.type or "image/png", uploaded_file.name, api_key)
+    )
+
+def canvas_dims(uploaded_file, max_w):
+    """Return (canvas_width, canvas_height) for an upload, computed once per file and max width."""
+    def compute():
+        img_width, img_height = _image_size(upload_bytes(uploaded_file))
+        # Keep the aspect ratio, capped at max_w
+        canvas_width = min(img_width, max_w)
+        return (canvas_width, int(canvas_width * img_height / img_width))
+    return _session_lru("_canvas_dims", (uploaded_file.file_id, max_w), compute)
+
 def download_image(url):
     """Download image from URL and return as bytes."""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.content
+        return _fetch_image_bytes(url)
     except Exception as e:
         st.error(f"Error downloading image: {str(e)}")
         return None
 
+def show_remote(url, caption):
+    """Show a result image; HTTPS URLs go straight to the browser as an <img> instead of through st.image."""
+    if not (isinstance(url, str) and url.startswith("https://")):
+        st.image(url, caption=caption, use_column_width=True)
+        return
+    st.markdown(
+        f'<figure style="margin:0"><img src="{html.escape(url, quote=True)}" style="width:100%"/>'
+        f'<figcaption style="text-align:center;font-size:0.875rem;opacity:0.6">{html.escape(caption)}</figcaption></figure>',
+        unsafe_allow_html=True
+    )
+
+@st.cache_data(max_entries=16, show_spinner=False, hash_funcs={bytes: _img_key})
+def _filter_image_bytes(image_bytes: bytes, filter_type: str) -> bytes:
+    """Apply a filter to encoded image bytes and return PNG bytes. Cached per (image, filter)."""
+    img = Image.open(io.BytesIO(image_bytes))
+    
+    if filter_type == "Grayscale":
+        img = img.convert('L')
+    elif filter_type == "Sepia":
+        # Apply the sepia matrix to the whole image in one NumPy pass
+        arr = np.asarray(img.convert('RGB'), dtype=np.float32)
+        out = arr @ SEPIA_MATRIX
+        np.clip(out, 0, 255, out=out)
+        img = Image.fromarray(out.astype(np.uint8))
+    elif filter_type == "High Contrast":
+        img = img.point(HIGH_CONTRAST_LUT * len(img.getbands()))
+    elif filter_type == "Blur":
+        if img.mode not in ('RGB', 'RGBA', 'L'):
+            # Kernel filters reject palette images; expand them first, keeping any transparency
+            img = img.convert('RGBA' if 'A' in img.mode or 'transparency' in img.info else 'RGB')
+        img = img.filter(ImageFilter.BLUR)
+    
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
 def apply_image_filter(image, filter_type):
-    """Apply various filters to the image."""
+    """Apply various filters to the image and return the result as PNG bytes.
+    
+    With no filter the original encoded bytes are returned untouched, without decoding.
+    """
     try:
-        img = Image.open(io.BytesIO(image)) if isinstance(image, bytes) else Image.open(image)
-        
-        if filter_type == "Grayscale":
-            return img.convert('L')
-        elif filter_type == "Sepia":
-            width, height = img.size
-            pixels = img.load()
-            for x in range(width):
-                for y in range(height):
-                    r, g, b = img.getpixel((x, y))[:3]
-                    tr = int(0.393 * r + 0.769 * g + 0.189 * b)
-                    tg = int(0.349 * r + 0.686 * g + 0.168 * b)
-                    tb = int(0.272 * r + 0.534 * g + 0.131 * b)
-                    img.putpixel((x, y), (min(tr, 255), min(tg, 255), min(tb, 255)))
-            return img
-        elif filter_type == "High Contrast":
-            return img.point(lambda x: x * 1.5)
-        elif filter_type == "Blur":
-            return img.filter(Image.BLUR)
-        else:
-            return img
+        image_bytes = image if isinstance(image, bytes) else image.read()
+        if filter_type in (None, "", "Original"):
+            return image_bytes
+        return _filter_image_bytes(image_bytes, filter_type)
     except Exception as e:
         st.error(f"Error applying filter: {str(e)}")
         return None
 
+@st.cache_data(show_spinner=False, hash_funcs={bytes: _img_key})
+def _image_size(img_bytes: bytes):
+    """Return (width, height) of encoded image bytes. Cached so reruns don't re-read the header."""
+    return Image.open(io.BytesIO(img_bytes)).size
+
+@st.cache_resource(show_spinner=False, max_entries=16, hash_funcs={bytes: _img_key})
+def _prep_canvas_image(img_bytes: bytes, target_w: int, target_h: int) -> Image.Image:
+    """Decode, resize and convert an upload for use as a canvas background. Cached per upload and size.
+    
+    cache_resource hands back the same fully-loaded image on every rerun (no unpickled copy),
+    so its pixels and the canvas data URL derived from them stay stable. Callers must not mutate it.
+    """
+    im = Image.open(io.BytesIO(img_bytes))
+    im = im.resize((target_w, target_h), Image.Resampling.LANCZOS)
+    im = im.convert('RGB') if im.mode != 'RGB' else im
+    im.load()
+    return im
+
+def _bytes_digest(b: bytes) -> bytes:
+    """128-bit BLAKE2b digest used to key API-response caches on image content."""
+    return hashlib.blake2b(b, digest_size=16).digest()
+
+# Cached API calls. Image parameters prefixed with "_" are excluded from Streamlit's hashing;
+# the accompanying digest keys the cache instead, so identical inputs skip the paid API call.
+# Only deterministic requests go through these. Lifestyle shots take no seed, so they are never
+# cached, and generative_fill_cached calls the service directly for async submits (placeholder
+# URLs that expire) and unseeded fills.
+@st.cache_data(show_spinner=False, ttl=24 * 3600, max_entries=32)
+def _cached_generative_fill(image_digest, mask_digest, _image_data, _mask_data, **params):
+    return generative_fill(image_data=_image_data, mask_data=_mask_data, **params)
+
+def generative_fill_cached(image_data, mask_data, **params):
+    """generative_fill answered from cache only when the result is reproducible: sync and seeded."""
+    if not params.get("sync") or params.get("seed") is None:
+        return generative_fill(image_data=image_data, mask_data=mask_data, **params)
+    return _cached_generative_fill(_bytes_digest(image_data), _bytes_digest(mask_data),
+                                   image_data, mask_data, **params)
+
+@st.cache_data(show_spinner=False, ttl=24 * 3600, max_entries=32)
+def _cached_erase_foreground(image_digest, _image_data, **params):
+    return erase_foreground(image_data=_image_data, **params)
+
+class _PromptNotEnhanced(Exception):
+    """Raised inside the enhance cache so a failed enhancement (original prompt echoed back) isn't cached."""
+
+@st.cache_data(show_spinner=False, ttl=600, max_entries=64)
+def _cached_enhance_prompt(prompt, _api_key, **params):
+    result = enhance_prompt(_api_key, prompt, **params)
+    if not result or result == prompt:
+        raise _PromptNotEnhanced()
+    return result
+
+def enhance_prompt_cached(api_key, prompt, **params):
+    """enhance_prompt with identical prompts answered from cache; falls back to the original prompt on failure."""
+    try:
+        return _cached_enhance_prompt(prompt, api_key, **params)
+    except _PromptNotEnhanced:
+        return prompt
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=16)
+def _cached_generate_video(_api_key, **params):
+    # Only used for seeded sync requests: an async submit must create a new request every time
+    return generate_video_from_image(api_key=_api_key, sync=True, **params)
+
+def generate_video_cached(api_key, **params):
+    """Sync generate_video_from_image, answered from cache only when a seed makes it reproducible."""
+    if "seed" not in params:
+        return generate_video_from_image(api_key=api_key, sync=True, **params)
+    return _cached_generate_video(api_key, **params)
+
+@st.cache_resource
+def _get_executors():
+    """Long-lived worker pools: interactive generation calls, minutes-long video jobs, and
+    concurrent HEAD polling of pending URLs."""
+    return (ThreadPoolExecutor(max_workers=4, thread_name_prefix="api"),
+            ThreadPoolExecutor(max_workers=4, thread_name_prefix="video"),
+            ThreadPoolExecutor(max_workers=8, thread_name_prefix="head"))
+
+# Worker threads for generation calls, so the script thread stays responsive to reruns.
+# Video jobs get their own pool so a few long renders can't starve image generation.
+_API_EXECUTOR, _VIDEO_EXECUTOR, _HEAD_EXECUTOR = _get_executors()
+
+def run_cancellable(fn, *args, **kwargs):
+    """Run a generation call off the script thread and supersede it if the user changes inputs.
+    
+    Streamlit can only interrupt a script when it emits an element, so the call is awaited in
+    short slices with a status update in between. A rerun triggered mid-generation takes over
+    at the next slice instead of waiting for the old HTTP request. The superseded request
+    finishes in the background and its result is dropped. The previous image stays on screen
+    until a new result arrives.
+    """
+    token = st.session_state.setdefault("cancel_tok", {"gen": None})
+    if token["gen"] is not None:
+        token["gen"].cancel()  # Drops a call that hasn't started; running requests can't be aborted
+    future = _API_EXECUTOR.submit(fn, *args, **kwargs)
+    token["gen"] = future
+    
+    status = st.empty()
+    started = time.monotonic()
+    while True:
+        try:
+            result = future.result(timeout=0.5)
+            break
+        except FuturesTimeoutError:
+            status.caption(f"Updating… {time.monotonic() - started:.0f}s")
+    status.empty()
+    return result
+
+def _iter_urls(result):
+    """Lazily yield image URLs from the nested "result" list of a Bria API response."""
+    items = result.get("result")
+    if not isinstance(items, list):
+        return
+    for item in items:
+        if isinstance(item, dict):
+            yield from item.get("urls", [])
+        elif isinstance(item, list):
+            yield from item
+
+def extract_urls(result, limit=1):
+    """Collect up to `limit` image URLs from any of the Bria API response shapes."""
+    if not isinstance(result, dict):
+        return []
+    if "result_url" in result:
+        return [result["result_url"]]
+    if "result_urls" in result:
+        return list(result["result_urls"][:limit])
+    if "urls" in result:
+        return list(result["urls"][:limit])
+    return list(itertools.islice(_iter_urls(result), limit))
+
+def head_status(url):
+    """Return the HEAD status code for a URL, or None if the request fails."""
+    try:
+        return _SESSION.head(url, timeout=3, stream=False, allow_redirects=False).status_code
+    except Exception:
+        return None
+
 def check_generated_images():
     """Check if pending images are ready and update the display."""
     if st.session_state.pending_urls:
         ready_images = []
         still_pending = []
         
-        for url in st.session_state.pending_urls:
-            try:
-                response = requests.head(url)
-                # Consider an image ready if we get a 200 response with any content length
-                if response.status_code == 200:
-                    ready_images.append(url)
-                else:
-                    still_pending.append(url)
-            except Exception as e:
-                still_pending.append(url)
+        # HEAD all pending URLs concurrently on the shared pool; results are handled in completion order
+        urls = st.session_state.pending_urls
+        futures = {_HEAD_EXECUTOR.submit(head_status, url): url for url in urls}
+        for future in as_completed(futures):
+            # Consider an image ready if we get a 200 response with any content length
+            if future.result() == 200:
+                ready_images.append(futures[future])
+            else:
+                still_pending.append(futures[future])
         
         # Update the pending URLs list
         st.session_state.pending_urls = still_pending
         
-        # If we found any ready images, update the display
+        # Show ready images right away instead of waiting for the whole batch
         if ready_images:
             st.session_state.edited_image = ready_images[0]  # Display the first ready image
-            if len(ready_images) > 1:
-                st.session_state.generated_images = ready_images  # Store all ready images
+            st.session_state.generated_images.extend(ready_images)  # Accumulate across polls
             return True
             
     return False
 
-def auto_check_images(status_container):
-    """Automatically check for image completion a few times."""
-    max_attempts = 3
-    attempt = 0
-    while attempt < max_attempts and st.session_state.pending_urls:
-        time.sleep(2)  # Wait 2 seconds between checks
-        if check_generated_images():
-            status_container.success("✨ Image ready!")
-            return True
-        attempt += 1
-    return False
+# Give up on async image URLs that haven't turned up after this long; they may have failed or expired
+PENDING_IMAGE_TIMEOUT = 300  # seconds
+
+def start_polling(urls, owner):
+    """Start waiting on async result URLs; poll_pending_images gives up after PENDING_IMAGE_TIMEOUT.
+    
+    owner is the pending_images_panel key of the tab that started the job. Only that tab polls,
+    so a URL is HEAD-checked once per tick however many tabs are showing a panel.
+    """
+    st.session_state.pending_urls = list(urls)
+    st.session_state.pending_owner = owner
+    st.session_state.pending_since = time.time()
+    st.session_state.expired_urls = []
+    st.session_state.generated_images = []
+
+@st.fragment(run_every=3.0)
+def poll_pending_images():
+    """Poll pending image URLs inside a fragment so only this block reruns until one is ready."""
+    urls = st.session_state.pending_urls
+    if not urls:
+        return
+    if check_generated_images():
+        st.rerun()  # Full rerun so the result panels pick up the new image
+    if time.time() - st.session_state.setdefault("pending_since", time.time()) > PENDING_IMAGE_TIMEOUT:
+        st.session_state.expired_urls = st.session_state.pending_urls
+        st.session_state.pending_urls = []
+        st.rerun()  # Full rerun stops this fragment's timer and shows the timeout notice
+    st.info(f"🎨 Generation started! Waiting for {len(urls)} image{'s' if len(urls) > 1 else ''}...")
+    if st.session_state.generated_images:
+        st.image(st.session_state.generated_images, width=120)  # Images finished so far
+
+def pending_images_panel(key):
+    """Poll pending images, or offer to keep waiting once polling has timed out. key names the tab; only the owner renders."""
+    if st.session_state.get("pending_owner") != key:
+        return
+    if st.session_state.pending_urls:
+        poll_pending_images()
+        return
+    expired = st.session_state.get("expired_urls")
+    if not expired:
+        return
+    st.warning(
+        f"⏱️ Stopped waiting for {len(expired)} image{'s' if len(expired) > 1 else ''} after "
+        f"{PENDING_IMAGE_TIMEOUT // 60} minutes. The generation may have failed or expired."
+    )
+    col_wait, col_dismiss = st.columns(2)
+    with col_wait:
+        if st.button("🔄 Keep waiting", key=f"{key}_keep_waiting"):
+            st.session_state.pending_urls = expired
+            st.session_state.pending_since = time.time()
+            st.session_state.expired_urls = []
+            st.rerun()
+    with col_dismiss:
+        if st.button("Dismiss", key=f"{key}_dismiss_pending"):
+            st.session_state.expired_urls = []
+            st.rerun()
+
+def _run_veo_job(prompt, image_bytes, image_url, api_key):
+    """Body of a Google Veo request, run on a worker thread: fetch the source image if needed, then wait on the model."""
+    if image_bytes is None and image_url:
+        image_bytes = _fetch_image_bytes(image_url)
+    return generate_video_with_google_veo(
+        prompt=prompt,
+        image_bytes=image_bytes,
+        api_key=api_key,
+        sync=True
+    )
+
+def start_background_job(job, fn, *args, **kwargs):
+    """Submit a long video job to its own pool; background_job_panel(job, ...) waits on it."""
+    st.session_state[f"{job}_result"] = None
+    st.session_state[f"{job}_error"] = None
+    st.session_state[f"{job}_future"] = _VIDEO_EXECUTOR.submit(fn, *args, **kwargs)
+
+@st.fragment(run_every=3.0)
+def background_job_panel(job, message):
+    """Wait on a background job inside a fragment so the rest of the app stays usable.
+    
+    The outcome lands in st.session_state[f"{job}_result"] or [f"{job}_error"].
+    """
+    future = st.session_state.get(f"{job}_future")
+    if future is None:
+        return
+    if not future.done():
+        st.info(message)
+        return
+    st.session_state[f"{job}_future"] = None
+    try:
+        st.session_state[f"{job}_result"] = future.result()
+    except Exception as e:
+        st.session_state[f"{job}_error"] = str(e)
+    st.rerun()  # Full rerun so the result renders outside the fragment
+
+@st.fragment
+def pending_requests_panel():
+    """Pending async fal requests. A fragment, so Refresh All and Get Result redraw only this list."""
+    if not st.session_state.get('video_requests'):
+        return
+    st.subheader("🎬 Pending Video Requests")
+    
+    # One concurrent status check for every pending request
+    if st.button("🔄 Refresh All", key="refresh_video_statuses"):
+        try:
+            fal_api_key = env['Fal.ai_LTX_API_KEY'] or st.session_state.get("fal_api_key")
+            if fal_api_key:
+                pending = st.session_state.video_requests
+                statuses = check_video_statuses_bulk(
+                    [(request['model'], request['request_id']) for request in pending],
+                    fal_api_key
+                )
+                st.session_state.video_statuses = {
+                    request['request_id']: status for request, status in zip(pending, statuses)
+                }
+            else:
+                st.error("API key required to check status")
+        except Exception as e:
+            st.error(f"Error checking status: {str(e)}")
+    video_statuses = st.session_state.get("video_statuses", {})
+    
+    for i, request in enumerate(st.session_state.video_requests):
+        with st.expander(f"Request {i+1}: {request['prompt'][:50]}..."):
+            st.write(f"**Request ID:** {request['request_id']}")
+            st.write(f"**Model:** {request['model']}")
+            st.write(f"**Prompt:** {request['prompt']}")
+            st.write(f"**Submitted:** {time.ctime(request['timestamp'])}")
+            
+            # Last status from "Refresh All"
+            if request['request_id'] in video_statuses:
+                st.json(video_statuses[request['request_id']])
+            
+            if st.button(f"Get Result", key=f"result_{i}"):
+                try:
+                    fal_api_key = env['Fal.ai_LTX_API_KEY'] or st.session_state.get("fal_api_key")
+                    if fal_api_key:
+                        result = get_video_result(request['model'], request['request_id'], fal_api_key)
+                        
+                        if "video" in result and "url" in result["video"]:
+                            st.success("✨ Video is ready!")
+                            st.video(result["video"]["url"])
+                            
+                            # Remove from pending requests
+                            st.session_state.video_requests.pop(i)
+                            st.rerun(scope="fragment")  # Only this list needs to redraw
+                        else:
+                            st.json(result)
+                    else:
+                        st.error("API key required to get result")
+                except Exception as e:
+                    st.error(f"Error getting result: {str(e)}")
 
 def main():
     st.title("AdSnap Studio")
@@ -212,7 +664,7 @@ def main():
             st.session_state.api_key = api_key
 
         # fal.ai API key
-        fal_default = st.session_state.get("fal_api_key") or os.getenv("Fal.ai_LTX_API_KEY", "")
+        fal_default = st.session_state.get("fal_api_key") or env['Fal.ai_LTX_API_KEY'] or ""
         fal_key_input = st.text_input(
             "Enter your fal.ai API key:",
             value=fal_default,
@@ -223,7 +675,7 @@ def main():
             st.session_state.fal_api_key = fal_key_input
 
         # Google GenAI API key (for Veo)
-        google_default = st.session_state.get("google_api_key") or os.getenv("GOOGLE_API_KEY", "")
+        google_default = st.session_state.get("google_api_key") or env['GOOGLE_API_KEY'] or ""
         google_key_input = st.text_input(
             "Enter your Google API key:",
             value=google_default,
@@ -233,6 +685,14 @@ def main():
         if google_key_input:
             st.session_state.google_api_key = google_key_input
 
+        # Debug output is off unless explicitly requested
+        st.checkbox(
+            "Developer debug",
+            value=bool(env['ADSNAP_DEBUG']),
+            key="_debug",
+            help="Show raw session state and API responses"
+        )
+
     # Main tabs
     tabs = st.tabs([
         "🎨 Generate Image",
@@ -261,10 +721,8 @@ def main():
                 st.session_state.original_prompt = prompt
                 st.session_state.enhanced_prompt = None  # Reset enhanced prompt when original changes
             
-            # Enhanced prompt display
-            if st.session_state.get('enhanced_prompt'):
-                st.markdown("**Enhanced Prompt:**")
-                st.markdown(f"*{st.session_state.enhanced_prompt}*")
+            # Enhanced prompt display, filled in after the button so a fresh result shows without a rerun
+            enhanced_prompt_container = st.empty()
             
             # Enhance Prompt button
             if st.button("✨ Enhance Prompt", key="enhance_button"):
@@ -273,24 +731,29 @@ def main():
                 else:
                     with st.spinner("Enhancing prompt..."):
                         try:
-                            result = enhance_prompt(st.session_state.api_key, prompt)
+                            result = enhance_prompt_cached(st.session_state.api_key, prompt)
                             if result:
                                 st.session_state.enhanced_prompt = result
                                 st.success("Prompt enhanced!")
-                                st.experimental_rerun()  # Rerun to update the display
                         except Exception as e:
                             st.error(f"Error enhancing prompt: {str(e)}")
+            
+            if st.session_state.get('enhanced_prompt'):
+                with enhanced_prompt_container.container():
+                    st.markdown("**Enhanced Prompt:**")
+                    st.markdown(f"*{st.session_state.enhanced_prompt}*")
                             
             # Debug information
-            st.write("Debug - Session State:", {
-                "original_prompt": st.session_state.get("original_prompt"),
-                "enhanced_prompt": st.session_state.get("enhanced_prompt")
-            })
+            if st.session_state.get('_debug'):
+                st.write("Debug - Session State:", {
+                    "original_prompt": st.session_state.get("original_prompt"),
+                    "enhanced_prompt": st.session_state.get("enhanced_prompt")
+                })
         
             # Settings section
             st.subheader("Generation Settings")
             num_images = st.slider("Number of images", 1, 4, 1)
-            aspect_ratio = st.selectbox("Aspect ratio", ["1:1", "16:9", "9:16", "4:3", "3:4"])
+            aspect_ratio = st.selectbox("Aspect ratio", IMAGE_ASPECT_RATIOS)
             enhance_img = st.checkbox("Enhance image quality", value=True)
             
             # Style options
@@ -327,25 +790,13 @@ def main():
                     
                     if result:
                         # Debug logging
-                        st.write("Debug - Raw API Response:", result)
+                        if st.session_state.get('_debug'):
+                            st.json(orjson.dumps(result).decode(), expanded=False)
                         
-                        if isinstance(result, dict):
-                            if "result_url" in result:
-                                st.session_state.edited_image = result["result_url"]
-                                st.success("✨ Image generated successfully!")
-                            elif "result_urls" in result:
-                                st.session_state.edited_image = result["result_urls"][0]
-                                st.success("✨ Image generated successfully!")
-                            elif "result" in result and isinstance(result["result"], list):
-                                for item in result["result"]:
-                                    if isinstance(item, dict) and "urls" in item:
-                                        st.session_state.edited_image = item["urls"][0]
-                                        st.success("✨ Image generated successfully!")
-                                        break
-                                    elif isinstance(item, list) and len(item) > 0:
-                                        st.session_state.edited_image = item[0]
-                                        st.success("✨ Image generated successfully!")
-                                        break
+                        urls = extract_urls(result, 1)
+                        if urls:
+                            st.session_state.edited_image = urls[0]
+                            st.success("✨ Image generated successfully!")
                         else:
                             st.error("No valid result format found in the API response.")
                             
@@ -356,7 +807,7 @@ def main():
         with col2:
             st.subheader("Generated Image")
             if st.session_state.edited_image:
-                st.image(st.session_state.edited_image, caption="Generated Image", use_column_width=True)
+                show_remote(st.session_state.edited_image, "Generated Image")
                 
                 # Download button
                 image_data = download_image(st.session_state.edited_image)
@@ -408,12 +859,12 @@ def main():
                                     from services.background_service import remove_background
                                     bg_result = remove_background(
                                         st.session_state.api_key,
-                                        uploaded_file.getvalue(),
+                                        upload_bytes(uploaded_file),
                                         content_moderation=content_moderation
                                     )
                                     if bg_result and "result_url" in bg_result:
                                         # Download the background-removed image
-                                        response = requests.get(bg_result["result_url"])
+                                        response = _SESSION.get(bg_result["result_url"], timeout=30)
                                         if response.status_code == 200:
                                             image_data = response.content
                                         else:
@@ -423,7 +874,7 @@ def main():
                                         st.error("Background removal failed")
                                         return
                                 else:
-                                    image_data = uploaded_file.getvalue()
+                                    image_data = upload_bytes(uploaded_file)
                                 
                                 # Now create packshot
                                 result = create_packshot(
@@ -477,7 +928,7 @@ def main():
                             try:
                                 result = add_shadow(
                                     api_key=st.session_state.api_key,
-                                    image_data=uploaded_file.getvalue(),
+                                    image_data=upload_bytes(uploaded_file),
                                     shadow_type=shadow_type.lower(),
                                     background_color=None if use_transparent_bg else bg_color,
                                     shadow_color=shadow_color,
@@ -573,9 +1024,11 @@ def main():
                                     else:
                                         manual_placements = ["upper_left"]
                                     
-                                    result = lifestyle_shot_by_text(
+                                    image_bytes = upload_bytes(uploaded_file)
+                                    result = run_cancellable(
+                                        lifestyle_shot_by_text,
+                                        image_data=image_bytes,
                                         api_key=st.session_state.api_key,
-                                        image_data=uploaded_file.getvalue(),
                                         scene_description=prompt,
                                         placement_type=placement_type.lower().replace(" ", "_"),
                                         num_results=num_results,
@@ -596,70 +1049,18 @@ def main():
                                     
                                     if result:
                                         # Debug logging
-                                        st.write("Debug - Raw API Response:", result)
+                                        if st.session_state.get('_debug'):
+                                            st.json(orjson.dumps(result).decode(), expanded=False)
                                         
                                         if sync_mode:
-                                            if isinstance(result, dict):
-                                                if "result_url" in result:
-                                                    st.session_state.edited_image = result["result_url"]
-                                                    st.success("✨ Image generated successfully!")
-                                                elif "result_urls" in result:
-                                                    st.session_state.edited_image = result["result_urls"][0]
-                                                    st.success("✨ Image generated successfully!")
-                                                elif "result" in result and isinstance(result["result"], list):
-                                                    for item in result["result"]:
-                                                        if isinstance(item, dict) and "urls" in item:
-                                                            st.session_state.edited_image = item["urls"][0]
-                                                            st.success("✨ Image generated successfully!")
-                                                            break
-                                                        elif isinstance(item, list) and len(item) > 0:
-                                                            st.session_state.edited_image = item[0]
-                                                            st.success("✨ Image generated successfully!")
-                                                            break
-                                                elif "urls" in result:
-                                                    st.session_state.edited_image = result["urls"][0]
-                                                    st.success("✨ Image generated successfully!")
+                                            urls = extract_urls(result, 1)
+                                            if urls:
+                                                st.session_state.edited_image = urls[0]
+                                                st.success("✨ Image generated successfully!")
                                         else:
-                                            urls = []
-                                            if isinstance(result, dict):
-                                                if "urls" in result:
-                                                    urls.extend(result["urls"][:num_results])  # Limit to requested number
-                                                elif "result" in result and isinstance(result["result"], list):
-                                                    # Process each result item
-                                                    for item in result["result"]:
-                                                        if isinstance(item, dict) and "urls" in item:
-                                                            urls.extend(item["urls"])
-                                                        elif isinstance(item, list):
-                                                            urls.extend(item)
-                                                        # Break if we have enough URLs
-                                                        if len(urls) >= num_results:
-                                                            break
-                                                    
-                                                    # Trim to requested number
-                                                    urls = urls[:num_results]
-                                            
+                                            urls = extract_urls(result, num_results)
                                             if urls:
-                                                st.session_state.pending_urls = urls
-                                                
-                                                # Create a container for status messages
-                                                status_container = st.empty()
-                                                refresh_container = st.empty()
-                                                
-                                                # Show initial status
-                                                status_container.info(f"🎨 Generation started! Waiting for {len(urls)} image{'s' if len(urls) > 1 else ''}...")
-                                                
-                                                # Try automatic checking first
-                                                if auto_check_images(status_container):
-                                                    st.experimental_rerun()
-                                                
-                                                # Add refresh button for manual checking
-                                                if refresh_container.button("🔄 Check for Generated Images"):
-                                                    with st.spinner("Checking for completed images..."):
-                                                        if check_generated_images():
-                                                            status_container.success("✨ Image ready!")
-                                                            st.experimental_rerun()
-                                                        else:
-                                                            status_container.warning(f"⏳ Still generating your image{'s' if len(urls) > 1 else ''}... Please check again in a moment.")
+                                                start_polling(urls, "product")
                                 except Exception as e:
                                     st.error(f"Error: {str(e)}")
                                     if "422" in str(e):
@@ -675,10 +1076,13 @@ def main():
                                     else:
                                         manual_placements = ["upper_left"]
                                     
-                                    result = lifestyle_shot_by_image(
+                                    image_bytes = upload_bytes(uploaded_file)
+                                    reference_bytes = upload_bytes(ref_image)
+                                    result = run_cancellable(
+                                        lifestyle_shot_by_image,
+                                        image_data=image_bytes,
+                                        reference_image=reference_bytes,
                                         api_key=st.session_state.api_key,
-                                        image_data=uploaded_file.getvalue(),
-                                        reference_image=ref_image.getvalue(),
                                         placement_type=placement_type.lower().replace(" ", "_"),
                                         num_results=num_results,
                                         sync=sync_mode,
@@ -697,78 +1101,28 @@ def main():
                                     
                                     if result:
                                         # Debug logging
-                                        st.write("Debug - Raw API Response:", result)
+                                        if st.session_state.get('_debug'):
+                                            st.json(orjson.dumps(result).decode(), expanded=False)
                                         
                                         if sync_mode:
-                                            if isinstance(result, dict):
-                                                if "result_url" in result:
-                                                    st.session_state.edited_image = result["result_url"]
-                                                    st.success("✨ Image generated successfully!")
-                                                elif "result_urls" in result:
-                                                    st.session_state.edited_image = result["result_urls"][0]
-                                                    st.success("✨ Image generated successfully!")
-                                                elif "result" in result and isinstance(result["result"], list):
-                                                    for item in result["result"]:
-                                                        if isinstance(item, dict) and "urls" in item:
-                                                            st.session_state.edited_image = item["urls"][0]
-                                                            st.success("✨ Image generated successfully!")
-                                                            break
-                                                        elif isinstance(item, list) and len(item) > 0:
-                                                            st.session_state.edited_image = item[0]
-                                                            st.success("✨ Image generated successfully!")
-                                                            break
-                                                elif "urls" in result:
-                                                    st.session_state.edited_image = result["urls"][0]
-                                                    st.success("✨ Image generated successfully!")
+                                            urls = extract_urls(result, 1)
+                                            if urls:
+                                                st.session_state.edited_image = urls[0]
+                                                st.success("✨ Image generated successfully!")
                                         else:
-                                            urls = []
-                                            if isinstance(result, dict):
-                                                if "urls" in result:
-                                                    urls.extend(result["urls"][:num_results])  # Limit to requested number
-                                                elif "result" in result and isinstance(result["result"], list):
-                                                    # Process each result item
-                                                    for item in result["result"]:
-                                                        if isinstance(item, dict) and "urls" in item:
-                                                            urls.extend(item["urls"])
-                                                        elif isinstance(item, list):
-                                                            urls.extend(item)
-                                                        # Break if we have enough URLs
-                                                        if len(urls) >= num_results:
-                                                            break
-                                                    
-                                                    # Trim to requested number
-                                                    urls = urls[:num_results]
-                                            
+                                            urls = extract_urls(result, num_results)
                                             if urls:
-                                                st.session_state.pending_urls = urls
-                                                
-                                                # Create a container for status messages
-                                                status_container = st.empty()
-                                                refresh_container = st.empty()
-                                                
-                                                # Show initial status
-                                                status_container.info(f"🎨 Generation started! Waiting for {len(urls)} image{'s' if len(urls) > 1 else ''}...")
-                                                
-                                                # Try automatic checking first
-                                                if auto_check_images(status_container):
-                                                    st.experimental_rerun()
-                                                
-                                                # Add refresh button for manual checking
-                                                if refresh_container.button("🔄 Check for Generated Images"):
-                                                    with st.spinner("Checking for completed images..."):
-                                                        if check_generated_images():
-                                                            status_container.success("✨ Image ready!")
-                                                            st.experimental_rerun()
-                                                        else:
-                                                            status_container.warning(f"⏳ Still generating your image{'s' if len(urls) > 1 else ''}... Please check again in a moment.")
+                                                start_polling(urls, "product")
                                 except Exception as e:
                                     st.error(f"Error: {str(e)}")
                                     if "422" in str(e):
                                         st.warning("Content moderation failed. Please ensure the content is appropriate.")
             
             with col2:
+                # Auto-polls in its own fragment while images are still being generated
+                pending_images_panel("product")
                 if st.session_state.edited_image:
-                    st.image(st.session_state.edited_image, caption="Edited Image", use_column_width=True)
+                    show_remote(st.session_state.edited_image, "Edited Image")
                     image_data = download_image(st.session_state.edited_image)
                     if image_data:
                         st.download_button(
@@ -777,8 +1131,6 @@ def main():
                             "edited_product.png",
                             "image/png"
                         )
-                elif st.session_state.pending_urls:
-                    st.info("Images are being generated. Click the refresh button above to check if they're ready.")
 
     # Generative Fill Tab
     with tabs[2]:
@@ -787,21 +1139,11 @@ def main():
         
         uploaded_file = st.file_uploader("Upload Image", type=["png", "jpg", "jpeg"], key="fill_upload")
         if uploaded_file:
-            # Get image dimensions for canvas
-            img = Image.open(uploaded_file)
-            img_width, img_height = img.size
-            
-            # Calculate aspect ratio and set canvas height
-            aspect_ratio = img_height / img_width
-            canvas_width = min(img_width, 600)  # Max width of 600px for better display
-            canvas_height = int(canvas_width * aspect_ratio)
-            
-            # Resize image to match canvas dimensions
-            img = img.resize((canvas_width, canvas_height), Image.Resampling.LANCZOS)
+            # Canvas size for this upload (max width of 600px for better display)
+            canvas_width, canvas_height = canvas_dims(uploaded_file, 600)
             
-            # Convert to RGB if necessary
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
+            # Resize and convert to RGB once per upload; reruns reuse the cached image
+            img = _prep_canvas_image(upload_bytes(uploaded_file), canvas_width, canvas_height)
             
             # Create single column layout for better canvas display
             st.subheader("Draw mask on your image")
@@ -859,22 +1201,23 @@ def main():
                     st.error("Please enter a prompt describing what to generate.")
                     return
                 
-                if canvas_result.image_data is None:
+                # An all-transparent canvas means nothing was drawn; skip the encode and API call
+                if canvas_result.image_data is None or not canvas_result.image_data[:, :, 3].any():
                     st.error("Please draw a mask on the image first.")
                     return
                 
                 try:
-                    # Convert canvas result to mask
-                    mask_img = Image.fromarray(canvas_result.image_data.astype('uint8'), mode='RGBA')
-                    mask_img = mask_img.convert('L')
+                    # Use the canvas alpha channel as the mask; strokes are opaque, the rest is transparent
+                    alpha = np.ascontiguousarray(canvas_result.image_data[:, :, 3].astype(np.uint8))
+                    mask_img = Image.fromarray(alpha)  # 2-D uint8 array gives an 'L' image
                     
                     # Convert mask to bytes
                     mask_bytes = io.BytesIO()
-                    mask_img.save(mask_bytes, format='PNG')
+                    mask_img.save(mask_bytes, format='PNG', compress_level=1, optimize=False)  # API decodes it straight back
                     mask_bytes = mask_bytes.getvalue()
                     
                     # Convert uploaded image to bytes
-                    image_bytes = uploaded_file.getvalue()
+                    image_bytes = upload_bytes(uploaded_file)
                     
                 except Exception as e:
                     st.error(f"Error processing image or mask: {str(e)}")
@@ -882,11 +1225,12 @@ def main():
                 
                 with st.spinner("🎨 Generating..."):
                     try:
-                        result = generative_fill(
-                                st.session_state.api_key,
+                        result = run_cancellable(
+                                generative_fill_cached,
                                 image_bytes,
                                 mask_bytes,
-                                prompt,
+                                api_key=st.session_state.api_key,
+                                prompt=prompt,
                                 negative_prompt=negative_prompt if negative_prompt else None,
                                 num_results=num_results,
                                 sync=sync_mode,
@@ -895,7 +1239,8 @@ def main():
                         )
                         
                         if result:
-                            st.write("Debug - API Response:", result)
+                            if st.session_state.get('_debug'):
+                                st.json(orjson.dumps(result).decode(), expanded=False)
                             
                             if sync_mode:
                                 if "urls" in result and result["urls"]:
@@ -908,34 +1253,17 @@ def main():
                                     st.success("✨ Generation complete!")
                             else:
                                 if "urls" in result:
-                                    st.session_state.pending_urls = result["urls"][:num_results]
-                                    
-                                    # Create containers for status
-                                    status_container = st.empty()
-                                    refresh_container = st.empty()
-                                    
-                                    # Show initial status
-                                    status_container.info(f"🎨 Generation started! Waiting for {len(st.session_state.pending_urls)} image{'s' if len(st.session_state.pending_urls) > 1 else ''}...")
-                                    
-                                    # Try automatic checking
-                                    if auto_check_images(status_container):
-                                        st.rerun()
-                                    
-                                    # Add refresh button
-                                    if refresh_container.button("🔄 Check for Generated Images"):
-                                        if check_generated_images():
-                                            status_container.success("✨ Images ready!")
-                                            st.rerun()
-                                        else:
-                                            status_container.warning("⏳ Still generating... Please check again in a moment.")
+                                    start_polling(result["urls"][:num_results], "fill")
                     except Exception as e:
                         st.error(f"Error: {str(e)}")
                         st.write("Full error details:", str(e))
             
             # Display results section
             st.subheader("Generated Result")
+            # Auto-polls in its own fragment while images are still being generated
+            pending_images_panel("fill")
             if st.session_state.edited_image:
-                st.image(st.session_state.edited_image, caption="Generated Result", use_column_width=True)
+                show_remote(st.session_state.edited_image, "Generated Result")
                 image_data = download_image(st.session_state.edited_image)
                 if image_data:
                     st.download_button(
@@ -944,20 +1272,6 @@ def main():
                         "generated_fill.png",
                         "image/png"
                     )
-            elif st.session_state.pending_urls:
-                st.info("Generation in progress. Click the refresh button above to check status.")
-                if st.session_state.edited_image:
-                    st.image(st.session_state.edited_image, caption="Generated Result", use_column_width=True)
-                    image_data = download_image(st.session_state.edited_image)
-                    if image_data:
-                        st.download_button(
-                            "⬇️ Download Result",
-                            image_data,
-                            "generated_fill.png",
-                            "image/png"
-                        )
-                elif st.session_state.pending_urls:
-                    st.info("Generation in progress. Click the refresh button above to check status.")
 
     # Erase Elements Tab
     with tabs[3]:
@@ -972,21 +1286,11 @@ def main():
                 # Display original image
                 st.image(uploaded_file, caption="Original Image", use_column_width=True)
                 
-                # Get image dimensions for canvas
-                img = Image.open(uploaded_file)
-                img_width, img_height = img.size
-                
-                # Calculate aspect ratio and set canvas height
-                aspect_ratio = img_height / img_width
-                canvas_width = min(img_width, 800)  # Max width of 800px
-                canvas_height = int(canvas_width * aspect_ratio)
+                # Canvas size for this upload (max width of 800px)
+                canvas_width, canvas_height = canvas_dims(uploaded_file, 800)
                 
-                # Resize image to match canvas dimensions
-                img = img.resize((canvas_width, canvas_height))
-                
-                # Convert to RGB if necessary
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
+                # Resize and convert to RGB once per upload; reruns reuse the cached image
+                img = _prep_canvas_image(upload_bytes(uploaded_file), canvas_width, canvas_height)
                 
                 # Add drawing canvas using Streamlit's drawing canvas component
                 stroke_width = st.slider("Brush width", 1, 50, 20, key="erase_brush_width")
@@ -1010,19 +1314,18 @@ def main():
                 content_moderation = st.checkbox("Enable Content Moderation", False, key="erase_content_mod")
                 
                 if st.button("🎨 Erase Selected Area", key="erase_btn"):
-                    if not canvas_result.image_data is None:
+                    # An all-transparent canvas means nothing was drawn
+                    if canvas_result.image_data is not None and canvas_result.image_data[:, :, 3].any():
                         with st.spinner("Erasing selected area..."):
                             try:
-                                # Convert canvas result to mask
-                                mask_img = Image.fromarray(canvas_result.image_data.astype('uint8'), mode='RGBA')
-                                mask_img = mask_img.convert('L')
-                                
+                                # erase_foreground detects the foreground itself; the drawn strokes only gate the call
                                 # Convert uploaded image to bytes
-                                image_bytes = uploaded_file.getvalue()
+                                image_bytes = upload_bytes(uploaded_file)
                                 
-                                result = erase_foreground(
-                                    st.session_state.api_key,
-                                    image_data=image_bytes,
+                                result = _cached_erase_foreground(
+                                    _bytes_digest(image_bytes),
+                                    image_bytes,
+                                    api_key=st.session_state.api_key,
                                     content_moderation=content_moderation
                                 )
                                 
@@ -1041,7 +1344,7 @@ def main():
             
             with col2:
                 if st.session_state.edited_image:
-                    st.image(st.session_state.edited_image, caption="Result", use_column_width=True)
+                    show_remote(st.session_state.edited_image, "Result")
                     image_data = download_image(st.session_state.edited_image)
                     if image_data:
                         st.download_button(
@@ -1066,7 +1369,9 @@ def main():
             
             if input_method == "Use Generated Image":
                 if st.session_state.edited_image:
-                    st.image(st.session_state.edited_image, caption="Current Generated Image", use_column_width=True)
+                    # Show the cached bytes so reruns don't make Streamlit refetch the URL
+                    preview = download_image(st.session_state.edited_image)
+                    st.image(preview or st.session_state.edited_image, caption="Current Generated Image", use_column_width=True)
                     image_source = st.session_state.edited_image
                 else:
                     st.warning("No generated image available. Please generate an image first or upload a new one.")
@@ -1079,96 +1384,107 @@ def main():
                     image_source = uploaded_video_image
                 else:
                     image_source = None
-            
-            # Video prompt
-            video_prompt = st.text_area(
-                "Describe the video motion and scene",
-                placeholder="A stylish woman walks down a Tokyo street filled with warm glowing neon and animated city signage.",
-                height=100,
-                key="video_prompt"
-            )
-            
+        
         with col2:
             # Video generation settings
             st.subheader("Video Settings")
             
             provider = st.selectbox(
                 "Provider",
-                options=["fal.ai", "Google Veo"],
+                options=VIDEO_PROVIDERS,
                 help="Choose the backend provider for video generation"
             )
             
             if provider == "fal.ai":
                 # Model selection
                 available_models = get_available_models()
-                model_names = {key: info["name"] for key, info in available_models.items()}
                 selected_model_key = st.selectbox(
                     "Select Video Model",
-                    options=list(model_names.keys()),
-                    format_func=lambda x: model_names[x],
+                    options=MODEL_IDS,
+                    format_func=MODEL_NAMES.__getitem__,
                     help="Different models have different capabilities and quality"
                 )
                 
                 selected_model = available_models[selected_model_key]
+                selected_caps = MODEL_CAPS[selected_model_key]
                 st.info(f"**{selected_model['name']}**\n\n{selected_model['description']}")
-                
-                # Model-specific settings
-                duration = st.slider(
-                    "Video Duration (seconds)",
-                    min_value=1,
-                    max_value=selected_model["max_duration"],
-                    value=min(5, selected_model["max_duration"]),
-                    help=f"Maximum duration for {selected_model['name']}: {selected_model['max_duration']}s"
+            else:
+                st.info("Using Google Veo 3.0. Duration/FPS settings are managed by the model. Provide a strong motion-focused prompt.")
+        
+        # Prompt and settings live in a form so adjusting them doesn't rerun the script; only Generate does.
+        # Provider and model stay outside since they decide which settings are shown.
+        with st.form("video_gen_form"):
+            form_col1, form_col2 = st.columns([2, 1])
+            
+            with form_col1:
+                # Video prompt
+                video_prompt = st.text_area(
+                    "Describe the video motion and scene",
+                    placeholder="A stylish woman walks down a Tokyo street filled with warm glowing neon and animated city signage.",
+                    height=100,
+                    key="video_prompt"
                 )
-                
-                if selected_model.get("supports_fps", False):
-                    fps = st.selectbox("Frames Per Second", [24, 30], index=0)
-                else:
-                    fps = None
-                
-                if selected_model.get("supports_motion_strength", False):
-                    motion_strength = st.slider(
-                        "Motion Strength",
-                        min_value=0.0,
-                        max_value=1.0,
-                        value=0.7,
-                        step=0.1,
-                        help="Higher values create more dramatic motion"
+            
+            with form_col2:
+                if provider == "fal.ai":
+                    # Model-specific settings
+                    duration = st.slider(
+                        "Video Duration (seconds)",
+                        min_value=1,
+                        max_value=selected_caps.max_duration,
+                        value=selected_caps.default_duration,
+                        help=f"Maximum duration for {selected_model['name']}: {selected_caps.max_duration}s"
+                    )
+                    
+                    if selected_caps.supports_fps:
+                        fps = st.selectbox("Frames Per Second", VIDEO_FPS_OPTIONS, index=0)
+                    else:
+                        fps = None
+                    
+                    if selected_caps.supports_motion_strength:
+                        motion_strength = st.slider(
+                            "Motion Strength",
+                            min_value=0.0,
+                            max_value=1.0,
+                            value=0.7,
+                            step=0.1,
+                            help="Higher values create more dramatic motion"
+                        )
+                    else:
+                        motion_strength = None
+                    
+                    # Additional settings
+                    aspect_ratio = st.selectbox(
+                        "Aspect Ratio",
+                        VIDEO_ASPECT_RATIOS,
+                        help="Video aspect ratio"
+                    )
+                    
+                    seed = st.number_input(
+                        "Seed (optional)",
+                        min_value=0,
+                        value=0,
+                        help="Use same seed for reproducible results"
+                    )
+                    
+                    sync_mode = st.checkbox(
+                        "Wait for completion",
+                        value=True,
+                        help="Wait for video generation to complete",
+                        key="fal_sync_mode"
                     )
                 else:
+                    duration = None
+                    fps = None
                     motion_strength = None
-                
-                # Additional settings
-                aspect_ratio = st.selectbox(
-                    "Aspect Ratio",
-                    ["16:9", "9:16", "1:1", "4:3", "3:4"],
-                    help="Video aspect ratio"
-                )
-                
-                seed = st.number_input(
-                    "Seed (optional)",
-                    min_value=0,
-                    value=0,
-                    help="Use same seed for reproducible results"
-                )
-                
-                sync_mode = st.checkbox(
-                    "Wait for completion",
-                    value=True,
-                    help="Wait for video generation to complete",
-                    key="fal_sync_mode"
-                )
-            else:
-                st.info("Using Google Veo 3.0. Duration/FPS settings are managed by the model. Provide a strong motion-focused prompt.")
-                duration = None
-                fps = None
-                motion_strength = None
-                aspect_ratio = None
-                seed = 0
-                sync_mode = True
+                    aspect_ratio = None
+                    seed = 0
+                    sync_mode = True
+            
+            # Generate video button
+            generate_video = st.form_submit_button("🎬 Generate Video", type="primary")
         
-        # Generate video button
-        if st.button("🎬 Generate Video", type="primary", key="generate_video_btn"):
+        if generate_video:
             if not video_prompt:
                 st.error("Please enter a video prompt describing the motion and scene.")
             elif not image_source:
@@ -1176,7 +1492,7 @@ def main():
             else:
                 if provider == "fal.ai":
                     # Get fal API key from environment or session
-                    fal_api_key = os.getenv("Fal.ai_LTX_API_KEY") or st.session_state.get("fal_api_key")
+                    fal_api_key = env['Fal.ai_LTX_API_KEY'] or st.session_state.get("fal_api_key")
                     
                     if not fal_api_key:
                         st.error("Please set your fal.ai API key in the .env file or enter it in the sidebar.")
@@ -1187,22 +1503,12 @@ def main():
                                 fal_api_key = fal_key_input
                     
                     if fal_api_key:
-                        with st.spinner("🎬 Generating video... This may take a few minutes."):
+                        with st.spinner("🎬 Submitting video request..."):
                             try:
                                 # Handle image upload if needed
                                 if input_method == "Upload New Image" and uploaded_video_image:
-                                    # Save uploaded file temporarily and upload to fal
-                                    temp_path = f"temp_video_image_{int(time.time())}.{uploaded_video_image.name.split('.')[-1]}"
-                                    with open(temp_path, "wb") as f:
-                                        f.write(uploaded_video_image.getvalue())
-                                    
-                                    try:
-                                        image_url = upload_image_for_video(temp_path, fal_api_key)
-                                        os.remove(temp_path)  # Clean up temp file
-                                    except Exception as e:
-                                        if os.path.exists(temp_path):
-                                            os.remove(temp_path)
-                                        raise e
+                                    # Upload the bytes we already hold straight to fal, once per distinct image
+                                    image_url = fal_upload_url(uploaded_video_image, fal_api_key)
                                 else:
                                     # Use the generated image URL directly
                                     image_url = image_source
@@ -1211,9 +1517,7 @@ def main():
                                 generation_params = {
                                     "image_url": image_url,
                                     "prompt": video_prompt,
-                                    "model": selected_model["id"],
-                                    "api_key": fal_api_key,
-                                    "sync": sync_mode
+                                    "model": selected_model["id"]
                                 }
                                 
                                 # Add optional parameters
@@ -1228,171 +1532,123 @@ def main():
                                 if seed != 0:
                                     generation_params["seed"] = seed
                                 
-                                # Generate video
-                                result = generate_video_from_image(**generation_params)
+                                # Sync mode runs in the background; identical seeded requests reuse the earlier result instead of re-billing
+                                if sync_mode:
+                                    start_background_job("fal", generate_video_cached, fal_api_key, **generation_params)
+                                    result = None
+                                else:
+                                    result = generate_video_from_image(api_key=fal_api_key, sync=False, **generation_params)
                                 
                                 if result:
-                                    st.write("Debug - Video Generation Result:", result)
+                                    if st.session_state.get('_debug'):
+                                        st.json(orjson.dumps(result).decode(), expanded=False)
                                     
-                                    if sync_mode:
-                                        # Handle synchronous result
-                                        if "video" in result and "url" in result["video"]:
-                                            video_url = result["video"]["url"]
-                                            st.success("✨ Video generated successfully!")
-                                            
-                                            # Display video
-                                            st.video(video_url)
-                                            
-                                            # Download button
-                                            try:
-                                                video_response = requests.get(video_url)
-                                                if video_response.status_code == 200:
-                                                    st.download_button(
-                                                        "⬇️ Download Video",
-                                                        video_response.content,
-                                                        f"generated_video_{int(time.time())}.mp4",
-                                                        "video/mp4"
-                                                    )
-                                            except Exception as e:
-                                                st.warning(f"Could not prepare download: {str(e)}")
+                                    # Handle asynchronous result
+                                    if "request_id" in result:
+                                        st.info(f"🎬 Video generation started! Request ID: {result['request_id']}")
+                                        st.info("Check back later or use the request ID to get the result.")
                                         
-                                        elif "url" in result:
-                                            video_url = result["url"]
-                                            st.success("✨ Video generated successfully!")
-                                            st.video(video_url)
-                                            
-                                            try:
-                                                video_response = requests.get(video_url)
-                                                if video_response.status_code == 200:
-                                                    st.download_button(
-                                                        "⬇️ Download Video",
-                                                        video_response.content,
-                                                        f"generated_video_{int(time.time())}.mp4",
-                                                        "video/mp4"
-                                                    )
-                                            except Exception as e:
-                                                st.warning(f"Could not prepare download: {str(e)}")
+                                        # Store request info in session state
+                                        if 'video_requests' not in st.session_state:
+                                            st.session_state.video_requests = []
                                         
-                                        else:
-                                            st.error("No video URL found in the response.")
-                                            st.json(result)
-                                    
+                                        st.session_state.video_requests.append({
+                                            'request_id': result['request_id'],
+                                            'model': selected_model["id"],
+                                            'prompt': video_prompt,
+                                            'timestamp': time.time()
+                                        })
                                     else:
-                                        # Handle asynchronous result
-                                        if "request_id" in result:
-                                            st.info(f"🎬 Video generation started! Request ID: {result['request_id']}")
-                                            st.info("Check back later or use the request ID to get the result.")
-                                            
-                                            # Store request info in session state
-                                            if 'video_requests' not in st.session_state:
-                                                st.session_state.video_requests = []
-                                            
-                                            st.session_state.video_requests.append({
-                                                'request_id': result['request_id'],
-                                                'model': selected_model["id"],
-                                                'prompt': video_prompt,
-                                                'timestamp': time.time()
-                                            })
-                                        else:
-                                            st.error("No request ID received for async generation.")
-                                            st.json(result)
+                                        st.error("No request ID received for async generation.")
+                                        st.json(result)
                             
                             except Exception as e:
                                 st.error(f"Error generating video: {str(e)}")
                                 st.write("Full error details:", str(e))
                 else:
                     # Google Veo path
-                    google_api_key = os.getenv("GOOGLE_API_KEY") or st.session_state.get("google_api_key")
+                    google_api_key = env['GOOGLE_API_KEY'] or st.session_state.get("google_api_key")
                     if not google_api_key:
                         st.error("Please set your Google API key in the .env file or enter it in the sidebar.")
                     else:
-                        with st.spinner("🎬 Generating video with Google Veo 3.0... This may take a few minutes."):
-                            try:
-                                # Prepare image bytes (optional)
-                                if input_method == "Upload New Image" and uploaded_video_image:
-                                    image_bytes = uploaded_video_image.getvalue()
-                                else:
-                                    # Download bytes from URL if available
-                                    if isinstance(image_source, str):
-                                        resp = requests.get(image_source)
-                                        resp.raise_for_status()
-                                        image_bytes = resp.content
-                                    else:
-                                        image_bytes = None
-
-                                veo_result = generate_video_with_google_veo(
-                                    prompt=video_prompt,
-                                    image_bytes=image_bytes,
-                                    api_key=google_api_key,
-                                    sync=True
-                                )
-
-                                if veo_result.get("status") == "completed":
-                                    st.success("✨ Video generated successfully with Google Veo!")
-                                    video_bytes = veo_result["video_bytes"]
-                                    filename = veo_result.get("filename", f"veo_video_{int(time.time())}.mp4")
-                                    
-                                    # Display video
-                                    st.video(video_bytes)
-                                    
-                                    # Download button
-                                    st.download_button(
-                                        "⬇️ Download Video",
-                                        video_bytes,
-                                        file_name=filename,
-                                        mime="video/mp4"
-                                    )
-                                else:
-                                    st.error("Video generation did not complete successfully.")
-                            except Exception as e:
-                                st.error(f"Error generating video with Google Veo: {str(e)}")
-                                st.write("Full error details:", str(e))
+                        # Prepare image bytes (optional)
+                        if input_method == "Upload New Image" and uploaded_video_image:
+                            image_bytes, image_url = upload_bytes(uploaded_video_image), None
+                        else:
+                            image_url = image_source if isinstance(image_source, str) else None
+                            # Already fetched for the preview when the image was picked, so this is a cache hit;
+                            # if that failed the worker retries from image_url
+                            image_bytes = download_image(image_url) if image_url else None
+                        
+                        # Run the multi-minute request in the background; background_job_panel polls for it
+                        start_background_job("veo", _run_veo_job, video_prompt, image_bytes, image_url, google_api_key)
         
-        # Show pending video requests if any
-        if hasattr(st.session_state, 'video_requests') and st.session_state.video_requests:
-            st.subheader("🎬 Pending Video Requests")
+        # fal sync job in flight, or its outcome
+        if st.session_state.get("fal_future") is not None:
+            background_job_panel("fal", "🎬 Generating video... This may take a few minutes.")
+        if st.session_state.get("fal_error"):
+            st.error(f"Error generating video: {st.session_state.fal_error}")
+            st.write("Full error details:", st.session_state.fal_error)
+        result = st.session_state.get("fal_result")
+        if result:
+            if st.session_state.get('_debug'):
+                st.json(orjson.dumps(result).decode(), expanded=False)
             
-            for i, request in enumerate(st.session_state.video_requests):
-                with st.expander(f"Request {i+1}: {request['prompt'][:50]}..."):
-                    st.write(f"**Request ID:** {request['request_id']}")
-                    st.write(f"**Model:** {request['model']}")
-                    st.write(f"**Prompt:** {request['prompt']}")
-                    st.write(f"**Submitted:** {time.ctime(request['timestamp'])}")
-                    
-                    col_a, col_b = st.columns(2)
-                    
-                    with col_a:
-                        if st.button(f"Check Status", key=f"status_{i}"):
-                            try:
-                                fal_api_key = os.getenv("Fal.ai_LTX_API_KEY") or st.session_state.get("fal_api_key")
-                                if fal_api_key:
-                                    status = check_video_status(request['model'], request['request_id'], fal_api_key)
-                                    st.json(status)
-                                else:
-                                    st.error("API key required to check status")
-                            except Exception as e:
-                                st.error(f"Error checking status: {str(e)}")
-                    
-                    with col_b:
-                        if st.button(f"Get Result", key=f"result_{i}"):
-                            try:
-                                fal_api_key = os.getenv("Fal.ai_LTX_API_KEY") or st.session_state.get("fal_api_key")
-                                if fal_api_key:
-                                    result = get_video_result(request['model'], request['request_id'], fal_api_key)
-                                    
-                                    if "video" in result and "url" in result["video"]:
-                                        st.success("✨ Video is ready!")
-                                        st.video(result["video"]["url"])
-                                        
-                                        # Remove from pending requests
-                                        st.session_state.video_requests.pop(i)
-                                        st.experimental_rerun()
-                                    else:
-                                        st.json(result)
-                                else:
-                                    st.error("API key required to get result")
-                            except Exception as e:
-                                st.error(f"Error getting result: {str(e)}")
+            if "video" in result and "url" in result["video"]:
+                video_url = result["video"]["url"]
+                st.success("✨ Video generated successfully!")
+                
+                # Display video
+                st.video(video_url)
+                
+                # Download button
+                try:
+                    video_download_button(video_url)
+                except Exception as e:
+                    st.warning(f"Could not prepare download: {str(e)}")
+            
+            elif "url" in result:
+                video_url = result["url"]
+                st.success("✨ Video generated successfully!")
+                st.video(video_url)
+                
+                try:
+                    video_download_button(video_url)
+                except Exception as e:
+                    st.warning(f"Could not prepare download: {str(e)}")
+            
+            else:
+                st.error("No video URL found in the response.")
+                st.json(result)
+        
+        # Google Veo job in flight, or its outcome
+        if st.session_state.get("veo_future") is not None:
+            background_job_panel("veo", "🎬 Generating video with Google Veo 3.0... This may take a few minutes.")
+        if st.session_state.get("veo_error"):
+            st.error(f"Error generating video with Google Veo: {st.session_state.veo_error}")
+            st.write("Full error details:", st.session_state.veo_error)
+        veo_result = st.session_state.get("veo_result")
+        if veo_result:
+            if veo_result.get("status") == "completed":
+                st.success("✨ Video generated successfully with Google Veo!")
+                video_bytes = veo_result["video_bytes"]
+                filename = veo_result.get("filename", f"veo_video_{int(time.time())}.mp4")
+                
+                # Display video
+                st.video(video_bytes)
+                
+                # Download button
+                st.download_button(
+                    "⬇️ Download Video",
+                    video_bytes,
+                    file_name=filename,
+                    mime="video/mp4"
+                )
+            else:
+                st.error("Video generation did not complete successfully.")
+        
+        # Show pending video requests if any
+        pending_requests_panel()
 
 if __name__ == "__main__":
     main()
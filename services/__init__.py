@@ -5,7 +5,7 @@ from .prompt_enhancement import enhance_prompt
 from .generative_fill import generative_fill
 from .hd_image_generation import generate_hd_image
 from .erase_foreground import erase_foreground
-from .video_generation import generate_video_from_image, check_video_status, get_video_result, upload_image_for_video, get_available_models
+from .video_generation import generate_video_from_image, check_video_status, check_video_statuses_bulk, poll_video_status, get_video_result, upload_image_for_video, upload_image_bytes_for_video, get_available_models, MODEL_NAMES, MODEL_IDS, MODEL_CAPS
 
 __all__ = [
     'lifestyle_shot_by_text',
@@ -18,7 +18,13 @@ __all__ = [
     'erase_foreground',
     'generate_video_from_image',
     'check_video_status',
+    'check_video_statuses_bulk',
+    'poll_video_status',
     'get_video_result',
     'upload_image_for_video',
-    'get_available_models'
+    'upload_image_bytes_for_video',
+    'get_available_models',
+    'MODEL_NAMES',
+    'MODEL_IDS',
+    'MODEL_CAPS'
 ]
\ No newline at end of file
@@ -0,0 +1,13 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# One keep-alive session for every outbound call (Bria, fal CDN, generated-image hosts), so
+# repeat requests to the same host skip the TCP/TLS handshake. Retry covers rate limits and
+# gateway errors on idempotent methods only; POSTs to the paid APIs are never replayed.
+_retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504])
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=_retry)
+
+SESSION = requests.Session()
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
@@ -1,6 +1,10 @@
 from typing import Dict, Any, Optional
-import requests
+from ._http import SESSION
+import orjson
 import base64
+import logging
+
+logger = logging.getLogger(__name__)
 
 def erase_foreground(
     api_key: str,
@@ -39,17 +43,17 @@ def erase_foreground(
         raise ValueError("Either image_data or image_url must be provided")
     
     try:
-        print(f"Making request to: {url}")
-        print(f"Headers: {headers}")
-        print(f"Data: {data}")
+        logger.debug("Making request to: %s", url)
+        logger.debug("Headers: %s", {**headers, 'api_token': '<redacted>'})
+        logger.debug("Data: %s", data)
         
-        response = requests.post(url, headers=headers, json=data)
+        response = SESSION.post(url, headers=headers, json=data)
         response.raise_for_status()
         
-        print(f"Response status: {response.status_code}")
-        print(f"Response body: {response.text}")
+        logger.debug("Response status: %s", response.status_code)
+        logger.debug("Response body: %s", response.content)
         
-        return response.json()
+        return orjson.loads(response.content)
     except Exception as e:
         raise Exception(f"Erase foreground failed: {str(e)}")
 
@@ -1,6 +1,10 @@
 from typing import Dict,Any,Optional,Union
-import requests
+from ._http import SESSION
+import orjson
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def generate_hd_image(
@@ -80,16 +84,16 @@ def generate_hd_image(
     }
 
     try:
-        print(f"Making request to: {url}")
-        print(f"With headers: {headers}")
+        logger.debug("Making request to: %s", url)
+        logger.debug("With headers: %s", {**headers, "api_token": "<redacted>"})
 
-        response = requests.post(url, json=data, headers=headers)
+        response = SESSION.post(url, json=data, headers=headers)
         response.raise_for_status()
 
-        print(f"Response status: {response.status_code}")
-        print(f"Response body: {response.text}")
+        logger.debug("Response status: %s", response.status_code)
+        logger.debug("Response body: %s", response.content)
 
-        return response.json()
+        return orjson.loads(response.content)
 
     except Exception as e:
         raise Exception(f"HD image Error generating image: {str(e)}")
\ No newline at end of file
@@ -1,6 +1,10 @@
 from typing import Dict, Any, Optional
-import requests
+from ._http import SESSION
+import orjson
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 def enhance_prompt(
     api_key: str,
@@ -23,21 +27,21 @@ def enhance_prompt(
 
     #for error handling and debugging
     try:
-        print(f"Making request to: {url}")
-        print(f"With headers: {headers}")
-        print(f"With data: {data}")
+        logger.debug("Making request to: %s", url)
+        logger.debug("With headers: %s", {**headers, 'api_token': '<redacted>'})
+        logger.debug("With data: %s", data)
         
         '''requests.post() → Bria API ko POST request bhej raha hai, saath me headers aur data.
         raise_for_status() → agar koi error aaya (404, 500) to exception throw karega.'''
-        response = requests.post(url, headers=headers, json=data)
+        response = SESSION.post(url, headers=headers, json=data)
         response.raise_for_status()
 
-        print(f"Response status: {response.status_code}")
-        print(f"Response body: {response.text}")
+        logger.debug("Response status: %s", response.status_code)
+        logger.debug("Response body: %s", response.content)
         
-        result = response.json()
+        result = orjson.loads(response.content)
         return result.get("prompt variations", prompt)  # Return original prompt if enhancement fails
     except Exception as e:
-        print(f"Error enhancing prompt: {e}")
+        logger.warning("Error enhancing prompt: %s", e)
         return prompt  # return original prompt on error
     
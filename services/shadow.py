@@ -1,6 +1,10 @@
 from typing import Dict, Any, List, Optional
-import requests
+from ._http import SESSION
+import orjson
 import base64
+import logging
+
+logger = logging.getLogger(__name__)
 
 def add_shadow(
     api_key: str,
@@ -79,16 +83,16 @@ def add_shadow(
         data['sku'] = sku
     
     try:
-        print(f"Making request to: {url}")
-        print(f"Headers: {headers}")
-        print(f"Data: {data}")
+        logger.debug("Making request to: %s", url)
+        logger.debug("Headers: %s", {**headers, 'api_token': '<redacted>'})
+        logger.debug("Data: %s", data)
         
-        response = requests.post(url, headers=headers, json=data)
+        response = SESSION.post(url, headers=headers, json=data)
         response.raise_for_status()
         
-        print(f"Response status: {response.status_code}")
-        print(f"Response body: {response.text}")
+        logger.debug("Response status: %s", response.status_code)
+        logger.debug("Response body: %s", response.content)
         
-        return response.json()
+        return orjson.loads(response.content)
     except Exception as e:
         raise Exception(f"Shadow addition failed: {str(e)}") 
\ No newline at end of file
@@ -1,8 +1,53 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Mapping, Optional, Tuple
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 import fal_client
 import os
+import logging
+import threading
 import time
 
+logger = logging.getLogger(__name__)
+
+class _TokenBucket:
+    """Thread-safe token bucket: allows bursts up to capacity, refilled at rate tokens per second."""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity  # Starts full, so capacity bounds the initial burst too
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """Block until a token is available, then take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# Client-side submit limit per fal API key, so bursts of clicks don't hit provider rate-limit errors.
+# fal limits per key, so each key gets its own bucket and users of different keys don't throttle each other.
+_RATE_LIMIT_RPM = 20
+_RATE_LIMIT_BURST = 3
+_rate_limiters: Dict[Optional[str], _TokenBucket] = {}
+_rate_limiters_lock = threading.Lock()
+
+def _rate_limiter(api_key: Optional[str]) -> _TokenBucket:
+    """Return the token bucket for an API key, creating it on first use."""
+    with _rate_limiters_lock:
+        bucket = _rate_limiters.get(api_key)
+        if bucket is None:
+            bucket = _rate_limiters[api_key] = _TokenBucket(rate=_RATE_LIMIT_RPM / 60, capacity=_RATE_LIMIT_BURST)
+        return bucket
+
 def generate_video_from_image(
     image_url: str,
     prompt: str,
@@ -61,28 +106,34 @@ def generate_video_from_image(
         arguments["seed"] = seed
     
     try:
-        print(f"Generating video with model: {model}")
-        print(f"Image URL: {image_url}")
-        print(f"Prompt: {prompt}")
-        print(f"Arguments: {arguments}")
+        # Wait for a submit slot rather than getting rate-limited by the provider
+        _rate_limiter(api_key or os.getenv("FAL_KEY")).acquire()
+        
+        logger.debug("Generating video with model: %s", model)
+        logger.debug("Image URL: %s", image_url)
+        logger.debug("Prompt: %s", prompt)
+        logger.debug("Arguments: %s", arguments)
         
         if sync:
-            # Use subscribe for synchronous operation with progress tracking
-            def on_queue_update(update):
-                if isinstance(update, fal_client.InProgress):
-                    print(f"Progress: {update.logs}")
-                    for log in update.logs:
-                        print(f"Log: {log.get('message', '')}")
+            # Submit, then poll status, rather than holding one subscribe connection open for minutes
+            handler = fal_client.submit(model, arguments=arguments)
+            try:
+                for update in poll_video_status(model, handler.request_id):
+                    if isinstance(update, fal_client.InProgress):
+                        for log in update.logs or []:
+                            logger.debug("Log: %s", log.get('message', ''))
+            except TimeoutError:
+                # Best effort: don't leave the abandoned job queued on fal's side
+                try:
+                    fal_client.cancel(model, handler.request_id)
+                except Exception as cancel_error:
+                    logger.debug("Could not cancel %s: %s", handler.request_id, cancel_error)
+                raise
             
-            result = fal_client.subscribe(
-                model,
-                arguments=arguments,
-                with_logs=True,
-                on_queue_update=on_queue_update
-            )
+            result = fal_client.result(model, handler.request_id)
             
-            print(f"Video generation completed!")
-            print(f"Result: {result}")
+            logger.debug("Video generation completed")
+            logger.debug("Result: %s", result)
             return result
             
         else:
@@ -100,7 +151,7 @@ def generate_video_from_image(
             }
             
     except Exception as e:
-        print(f"Error generating video: {str(e)}")
+        logger.warning("Error generating video: %s", e)
         raise Exception(f"Video generation failed: {str(e)}")
 
 def check_video_status(
@@ -124,11 +175,75 @@ def check_video_status(
     
     try:
         status = fal_client.status(model, request_id, with_logs=True)
-        print(f"Status check result: {status}")
+        logger.debug("Status check result: %s", status)
         return status
     except Exception as e:
         raise Exception(f"Status check failed: {str(e)}")
 
+def check_video_statuses_bulk(
+    pairs: List[Tuple[str, str]],
+    api_key: Optional[str] = None
+) -> List[Any]:
+    """
+    Check the status of several video generation requests concurrently.
+    
+    Args:
+        pairs: (model, request_id) tuples, one per request
+        api_key: fal AI API key
+    
+    Returns:
+        One entry per pair, in order: the fal status, or a dict with an "error" message if that check failed
+    """
+    if api_key:
+        os.environ["FAL_KEY"] = api_key
+    if not pairs:
+        return []
+    
+    def _status(pair):
+        model, request_id = pair
+        try:
+            return fal_client.status(model, request_id, with_logs=True)
+        except Exception as e:
+            return {"error": f"Status check failed: {str(e)}"}
+    
+    # All checks in flight at once, so N requests cost about one round-trip
+    with ThreadPoolExecutor(max_workers=min(8, len(pairs))) as executor:
+        return list(executor.map(_status, pairs))
+
+# Give up on a sync generation after this long, so a stuck job can't hold a worker forever
+VIDEO_POLL_TIMEOUT = 600  # seconds
+
+def poll_video_status(
+    model: str,
+    request_id: str,
+    interval: float = 2.0,
+    timeout: float = VIDEO_POLL_TIMEOUT
+) -> Iterator[fal_client.Status]:
+    """
+    Yield the status of a video generation request until it completes.
+    
+    Args:
+        model: fal AI model used for generation
+        request_id: Request ID from submit operation
+        interval: Seconds to wait between status checks
+        timeout: Seconds to wait for completion before giving up
+    
+    Yields:
+        fal status objects (Queued, InProgress, then Completed)
+    
+    Raises:
+        TimeoutError: If the request has not completed within timeout seconds
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        status = fal_client.status(model, request_id, with_logs=True)
+        yield status
+        if isinstance(status, fal_client.Completed):
+            return
+        if time.monotonic() + interval > deadline:
+            raise TimeoutError(f"Request {request_id} did not complete within {timeout:.0f}s")
+        time.sleep(interval)
+
 def get_video_result(
     model: str,
     request_id: str,
@@ -150,7 +265,7 @@ def get_video_result(
     
     try:
         result = fal_client.result(model, request_id)
-        print(f"Video generation result: {result}")
+        logger.debug("Video generation result: %s", result)
         return result
     except Exception as e:
         raise Exception(f"Result retrieval failed: {str(e)}")
@@ -174,13 +289,41 @@ def upload_image_for_video(
     
     try:
         url = fal_client.upload_file(image_path)
-        print(f"Image uploaded successfully: {url}")
+        logger.debug("Image uploaded successfully: %s", url)
+        return url
+    except Exception as e:
+        raise Exception(f"Image upload failed: {str(e)}")
+
+def upload_image_bytes_for_video(
+    image_data: bytes,
+    content_type: str,
+    file_name: Optional[str] = None,
+    api_key: Optional[str] = None
+) -> str:
+    """
+    Upload in-memory image bytes to fal and get a URL for video generation, without a temp file.
+    
+    Args:
+        image_data: Image data in bytes
+        content_type: MIME type of the image (e.g. "image/png")
+        file_name: Optional file name to store the upload under
+        api_key: fal AI API key
+    
+    Returns:
+        URL of the uploaded image
+    """
+    if api_key:
+        os.environ["FAL_KEY"] = api_key
+    
+    try:
+        url = fal_client.upload(image_data, content_type, file_name)
+        logger.debug("Image uploaded successfully: %s", url)
         return url
     except Exception as e:
         raise Exception(f"Image upload failed: {str(e)}")
 
-# Available video generation models
-VIDEO_MODELS = {
+# Available video generation models (read-only: shared by every session)
+VIDEO_MODELS = MappingProxyType({key: MappingProxyType(info) for key, info in {
     "minimax": {
         "id": "fal-ai/minimax-video/image-to-video",
         "name": "MiniMax Video",
@@ -205,13 +348,35 @@ VIDEO_MODELS = {
         "supports_fps": True,
         "supports_motion_strength": True
     }
-}
+}.items()})
+
+# Selector data derived once at import
+MODEL_NAMES = MappingProxyType({key: info["name"] for key, info in VIDEO_MODELS.items()})
+MODEL_IDS = tuple(VIDEO_MODELS)
+
+@dataclass(frozen=True)
+class ModelCaps:
+    """Settings a video model accepts, resolved from VIDEO_MODELS once."""
+    max_duration: int
+    default_duration: int
+    supports_fps: bool
+    supports_motion_strength: bool
+
+MODEL_CAPS = MappingProxyType({
+    key: ModelCaps(
+        max_duration=info["max_duration"],
+        default_duration=min(5, info["max_duration"]),
+        supports_fps=info.get("supports_fps", False),
+        supports_motion_strength=info.get("supports_motion_strength", False)
+    )
+    for key, info in VIDEO_MODELS.items()
+})
 
-def get_available_models() -> Dict[str, Dict[str, Any]]:
+def get_available_models() -> Mapping[str, Mapping[str, Any]]:
     """
     Get information about available video generation models.
     
     Returns:
-        Dict containing model information
+        Read-only mapping of model key to model information
     """
     return VIDEO_MODELS